@@ -0,0 +1,222 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+# Pin definitions (BCM numbering)
+BUZZER_PIN = 3
+RED_PIN = 18
+GREEN_PIN = 15
+BLUE_PIN = 14
+NIGHT_LIGHT_PIN = 7
+
+# Each channel owns a group of pins; playing a pattern on a channel replaces
+# whatever that channel was doing without touching the others.
+CHANNELS = {
+    'siren': (BUZZER_PIN, RED_PIN, GREEN_PIN, BLUE_PIN),
+    'night_light': (NIGHT_LIGHT_PIN,),
+}
+
+# Patterns are lists of (seconds, {pin: level}) steps; pins of the channel
+# not named in a step are driven low. A duration of None holds the step.
+SIREN_PATTERN = [
+    (0.5, {BUZZER_PIN: 1, RED_PIN: 1}),   # tone + red
+    (0.5, {BLUE_PIN: 1}),                 # silence + blue
+]
+
+logger = logging.getLogger('actuators')
+
+
+# -----------------------------------------------------------------------------
+# GPIO backends
+# -----------------------------------------------------------------------------
+class MockGPIO:
+    """Stand-in for the subset of RPi.GPIO we use, for running off the Pi.
+
+    `states` holds the current level of every pin and `writes` logs each
+    (monotonic time, pin, level) so patterns can be checked after the fact.
+    """
+    BCM = 'BCM'
+    OUT = 'OUT'
+    HIGH = 1
+    LOW = 0
+
+    def __init__(self):
+        self.mode = None
+        self.states = {}
+        self.writes = []
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setup(self, pin, direction):
+        self.states[pin] = self.LOW
+
+    def output(self, pin, level):
+        self.states[pin] = level
+        self.writes.append((time.monotonic(), pin, level))
+
+    def cleanup(self):
+        self.states.clear()
+
+
+def load_gpio_backend():
+    """Return RPi.GPIO, or MockGPIO when MOTION_GPIO_BACKEND=mock.
+
+    There is deliberately no automatic fallback: on a Pi where RPi.GPIO is
+    missing or not permitted, a silent mock would leave the siren and lights
+    dead while startup reports GPIO as ready. The import error propagates
+    instead.
+    """
+    if os.environ.get('MOTION_GPIO_BACKEND') == 'mock':
+        logger.info("Using mock GPIO backend")
+        return MockGPIO()
+    import RPi.GPIO as GPIO
+    return GPIO
+
+
+# -----------------------------------------------------------------------------
+# Scheduler
+# -----------------------------------------------------------------------------
+class ActuatorService:
+    """Drive every actuator pin from a single timer-driven thread.
+
+    Callers only enqueue commands, so play/set/stop never block (the capture
+    thread can call them mid-frame), and because one thread owns all pins two
+    patterns can never fight over the same output.
+    """
+
+    def __init__(self, gpio=None, channels=CHANNELS):
+        self.gpio = gpio if gpio is not None else load_gpio_backend()
+        self.channels = channels
+        self.commands = queue.Queue()
+        self.active = {}  # channel -> [pattern, step index, deadline, repeat]
+        self.gpio.setmode(self.gpio.BCM)
+        for pins in channels.values():
+            for pin in pins:
+                self.gpio.setup(pin, self.gpio.OUT)
+                self.gpio.output(pin, self.gpio.LOW)
+        self.thread = threading.Thread(target=self._run, name='actuators', daemon=True)
+        self.thread.start()
+
+    # --- public, non-blocking API ---
+    def play(self, channel, pattern, repeat=True):
+        self._check(channel, pattern)
+        self.commands.put(('play', channel, list(pattern), repeat))
+
+    def set(self, channel, levels):
+        """Hold `levels` on the channel until told otherwise."""
+        self.play(channel, [(None, levels)], repeat=False)
+
+    def stop(self, channel):
+        self._check(channel, [])
+        self.commands.put(('stop', channel))
+
+    def shutdown(self, timeout=2.0):
+        """Drive all pins low, release GPIO and stop the thread."""
+        self.commands.put(('shutdown',))
+        self.thread.join(timeout)
+
+    def _check(self, channel, pattern):
+        if channel not in self.channels:
+            raise ValueError(f"unknown actuator channel {channel!r}")
+        for _, levels in pattern:
+            stray = set(levels) - set(self.channels[channel])
+            if stray:
+                raise ValueError(f"pins {sorted(stray)} do not belong to {channel!r}")
+
+    # --- scheduler thread ---
+    def _run(self):
+        running = True
+        while running:
+            try:
+                cmd = self.commands.get(timeout=self._next_timeout())
+            except queue.Empty:
+                cmd = None
+            try:
+                if cmd is not None:
+                    running = self._handle(cmd)
+                self._advance(time.monotonic())
+            except Exception:
+                logger.exception("Actuator command failed: %r", cmd)
+        for channel in list(self.channels):
+            self._drive(channel, {})
+        self.active.clear()
+        self.gpio.cleanup()
+
+    def _next_timeout(self):
+        deadlines = [a[2] for a in self.active.values() if a[2] is not None]
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - time.monotonic())
+
+    def _handle(self, cmd):
+        kind = cmd[0]
+        if kind == 'shutdown':
+            return False
+        channel = cmd[1]
+        if kind == 'stop':
+            self.active.pop(channel, None)
+            self._drive(channel, {})
+        elif kind == 'play':
+            pattern, repeat = cmd[2], cmd[3]
+            if not pattern:
+                self.active.pop(channel, None)
+                self._drive(channel, {})
+                return True
+            self.active[channel] = [pattern, 0, self._deadline(pattern[0], time.monotonic()), repeat]
+            self._drive(channel, pattern[0][1])
+        return True
+
+    @staticmethod
+    def _deadline(step, now):
+        return None if step[0] is None else now + step[0]
+
+    def _advance(self, now):
+        for channel, state in list(self.active.items()):
+            pattern, idx, deadline, repeat = state
+            if deadline is None or deadline > now:
+                continue
+            idx += 1
+            if idx == len(pattern):
+                if not repeat:
+                    del self.active[channel]
+                    self._drive(channel, {})
+                    continue
+                idx = 0
+            step = pattern[idx]
+            # Keep the cadence drift-free, but resync if we fell far behind
+            if step[0] is not None and now - deadline < step[0]:
+                state[2] = deadline + step[0]
+            else:
+                state[2] = self._deadline(step, now)
+            state[1] = idx
+            self._drive(channel, step[1])
+
+    def _drive(self, channel, levels):
+        for pin in self.channels[channel]:
+            self.gpio.output(pin, self.gpio.HIGH if levels.get(pin) else self.gpio.LOW)
+
+
+# -----------------------------------------------------------------------------
+# Process-wide instance
+# -----------------------------------------------------------------------------
+_service = None
+_service_lock = threading.Lock()
+
+def get_service():
+    """Return the shared ActuatorService, creating it on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ActuatorService()
+        return _service
+
+def shutdown():
+    """Stop the shared service (if running) and release GPIO."""
+    global _service
+    with _service_lock:
+        service, _service = _service, None
+    if service is not None:
+        service.shutdown()
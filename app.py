@@ -1,41 +1,41 @@
 #!/usr/bin/env python3
 import threading
 import time
+import json
 import os
 import logging
 import signal
 from datetime import datetime
 from functools import wraps
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
 
 import yaml
-import cv2
-import numpy as np
 from flask import (
     Flask, Response, render_template, render_template_string,
-    request, redirect, url_for, session, send_file
+    request, redirect, url_for, session, send_file, jsonify, g
+)
+from werkzeug.security import check_password_hash
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+
+# cv2, picamera2 and RPi.GPIO (via buzzer) are imported lazily: they take
+# seconds to load on a Pi and nothing in the web layer needs them to answer.
+import actuators
+from actuators import NIGHT_LIGHT_PIN
+from startup import report as startup_report
+from event_bus import EventBus
+from streaming import MjpegServer, mjpeg_part
+from tracing import tracer
+from offload import Offloader
+from export import (
+    parse_bound, end_of_day, range_events, zip_members, zip_stream,
+    ffmpeg_available, concat_stream
+)
+from event_store import parse_timestamp, video_event, frames_event, list_events, event_path
+from settings import (
+    load_server_config, load_motion_config, validate_motion_config,
+    merge_config, diff_motion_config, save_motion_config, MotionConfigWatcher
 )
-from werkzeug.security import generate_password_hash, check_password_hash
-from picamera2 import Picamera2
-import RPi.GPIO as GPIO
-
-from buzzer import setup_gpio, activate_siren, deactivate_siren
-
-from datetime import datetime
-
-def parse_timestamp(name: str) -> str:
-    """
-    Try to parse `name` as either YYYYMMDD_HHMMSS or YYYYMMDD.
-    If that fails, return the raw `name`.
-    """
-    for fmt, out_fmt in (
-        ("%Y%m%d_%H%M%S", "%Y-%m-%d %H:%M:%S"),
-        ("%Y%m%d",       "%Y-%m-%d")):
-        try:
-            return datetime.strptime(name, fmt).strftime(out_fmt)
-        except ValueError:
-            continue
-    return name
-
 
 # -----------------------------------------------------------------------------
 # HTML templates embedded in this one script
@@ -141,196 +141,328 @@ FRAMES_HTML = """
 </html>
 """
 
-# -----------------------------------------------------------------------------
-# Configuration loaders
-# -----------------------------------------------------------------------------
-def load_server_config():
-    BASE_DIR = os.path.expanduser('~/project/Miro/')
-    CONFIG_PATH = os.path.join(BASE_DIR, 'config', 'server_config.yml')
-    default = {
-        'base_dir': BASE_DIR,
-        'motion_images_dir': 'motion_images',
-        'motion_videos_dir': 'motion_videos',
-        'users': {'admin': generate_password_hash('admin')},
-        'server': {'host': '0.0.0.0', 'port': 8087}
-    }
-    os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
-    if not os.path.exists(CONFIG_PATH):
-        with open(CONFIG_PATH, 'w') as f:
-            yaml.dump(default, f)
-        return default
-    try:
-        with open(CONFIG_PATH) as f:
-            cfg = yaml.safe_load(f) or default
-    except Exception:
-        cfg = default
-    return cfg
-
-def load_motion_config():
-    CONFIG_DIR = 'config'
-    CONFIG_PATH = os.path.join(CONFIG_DIR, 'motion_config.yml')
-    default = {
-        'camera': {'resolution': {'width': 640, 'height': 360}, 'fps': 20},
-        'motion_detection': {'min_area': 2000, 'min_frames_for_video': 10},
-        'alarm': {'enabled': True, 'duration': 30}
-    }
-    os.makedirs(CONFIG_DIR, exist_ok=True)
-    if not os.path.exists(CONFIG_PATH):
-        with open(CONFIG_PATH, 'w') as f:
-            yaml.dump(default, f)
-        return default
-    try:
-        with open(CONFIG_PATH) as f:
-            cfg = yaml.safe_load(f) or default
-    except Exception:
-        cfg = default
-    return cfg
-    
-   # Ensure alarm duration is valid, default to 5 seconds if not loaded or invalid
-    if 'alarm' not in cfg or 'duration' not in cfg['alarm'] or not isinstance(cfg['alarm']['duration'], int):
-        cfg['alarm']['duration'] = 5  # Default to 5 seconds if not correctly loaded
-    
-    return cfg
-
 # -----------------------------------------------------------------------------
 # Globals for frame sharing and shutdown signaling
 # -----------------------------------------------------------------------------
 latest_frame = None
+frame_seq     = 0      # bumped with every new latest_frame
 frame_lock    = threading.Lock()
+detector      = None   # CascadeDetector owned by the motion thread
+duty_cycle    = None   # DutyCycle pacing the motion thread
 stop_event    = threading.Event()
 
+# Config handed over by the watcher / API, applied by the motion thread
+# between frames so a swap never races a half-processed frame.
+pending_motion_cfg = None
+config_lock        = threading.Lock()
+# Serialises read-merge-save-submit in /api/config so concurrent updates
+# cannot overwrite each other
+config_update_lock = threading.Lock()
+
+def submit_motion_config(cfg):
+    global pending_motion_cfg, motion_cfg
+    with config_lock:
+        pending_motion_cfg = motion_cfg = cfg
+
+def take_pending_motion_config():
+    global pending_motion_cfg
+    with config_lock:
+        cfg, pending_motion_cfg = pending_motion_cfg, None
+    return cfg
+
+# Live pipeline events for /events/stream. `live_state` is what a freshly
+# connected page needs to render before the next change arrives.
+event_bus  = EventBus()
+live_state = {'recording': False, 'alarm': False}
+
+def publish_state(kind, **changes):
+    live_state.update(changes)
+    event_bus.publish(kind, **live_state)
+
 # -----------------------------------------------------------------------------
 # GPIO-based night-light
 # -----------------------------------------------------------------------------
-NIGHT_LIGHT_PIN = 7
+# Pins are driven by the shared actuator service (see actuators.py)
 def setup_night_light():
-    GPIO.setmode(GPIO.BCM)
-    GPIO.setup(NIGHT_LIGHT_PIN, GPIO.OUT)
+    actuators.get_service()
 
 def activate_night_light():
-    GPIO.output(NIGHT_LIGHT_PIN, GPIO.HIGH)
+    actuators.get_service().set('night_light', {NIGHT_LIGHT_PIN: 1})
 
 def deactivate_night_light():
-    GPIO.output(NIGHT_LIGHT_PIN, GPIO.LOW)
+    actuators.get_service().stop('night_light')
 
 # -----------------------------------------------------------------------------
-# Motion detection & saving helpers
+# Event & saving helpers
 # -----------------------------------------------------------------------------
-def detect_motion(prev, curr, min_area):
-    grayA = cv2.cvtColor(prev, cv2.COLOR_BGR2GRAY)
-    grayB = cv2.cvtColor(curr, cv2.COLOR_BGR2GRAY)
-    grayA = cv2.GaussianBlur(grayA, (21,21), 0)
-    grayB = cv2.GaussianBlur(grayB, (21,21), 0)
-    delta = cv2.absdiff(grayA, grayB)
-    thresh = cv2.threshold(delta, 25, 255, cv2.THRESH_BINARY)[1]
-    thresh = cv2.dilate(thresh, None, iterations=2)
-    cnts, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    return any(cv2.contourArea(c) > min_area for c in cnts)
-
 def save_images(frames, base_dir, start_time):
+    import cv2
     ts = start_time.strftime("%Y%m%d_%H%M%S")
     outdir = os.path.join(base_dir, ts)
     os.makedirs(outdir, exist_ok=True)
     for i, f in enumerate(frames):
         cv2.imwrite(os.path.join(outdir, f"frame_{i:03d}.jpg"), f)
+    return frames_event(ts, len(frames))
 
-def save_video(frames, cfg, base_dir):
+def save_video(frames, cfg, vid_dir, img_dir):
+    """Save a recording as a video, or as stills if it is too short.
+
+    Returns the event entry as listed on the events page.
+    """
+    import cv2
     fps       = cfg['camera']['fps']
     min_frames = cfg['motion_detection']['min_frames_for_video']
-    if len(frames) < min_frames:
-        save_images(frames, base_dir, datetime.now())
-        return
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    outpath = os.path.join(base_dir, f"motion_{ts}.avi")
-    h, w = frames[0].shape[:2]
-    writer = cv2.VideoWriter(outpath, cv2.VideoWriter_fourcc(*'XVID'), fps, (w,h))
-    for f in frames:
-        writer.write(f)
-    writer.release()
+    with tracer.span('save_video', {'frames': len(frames)}):
+        if len(frames) < min_frames:
+            return save_images(frames, img_dir, datetime.now())
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        outpath = os.path.join(vid_dir, f"motion_{ts}.avi")
+        h, w = frames[0].shape[:2]
+        writer = cv2.VideoWriter(outpath, cv2.VideoWriter_fourcc(*'XVID'), fps, (w,h))
+        for f in frames:
+            writer.write(f)
+        writer.release()
+    return video_event(os.path.basename(outpath))
 
 # -----------------------------------------------------------------------------
 # Background motion-detection thread
 # -----------------------------------------------------------------------------
-def motion_loop(server_cfg, motion_cfg):
-    logger = logging.getLogger('motion-thread')
+def setup_camera(cfg):
+    from picamera2 import Picamera2
     picam2 = Picamera2()
-    w = motion_cfg['camera']['resolution']['width']
-    h = motion_cfg['camera']['resolution']['height']
+    configure_camera(picam2, cfg)
+    picam2.start()
+    return picam2
+
+def configure_camera(picam2, cfg):
+    w = cfg['camera']['resolution']['width']
+    h = cfg['camera']['resolution']['height']
     cam_conf = picam2.create_preview_configuration(main={'size': (w,h)})
     picam2.configure(cam_conf)
-    picam2.start()
 
-    if motion_cfg['alarm']['enabled']:
-        setup_gpio()
-    setup_night_light()
-    activate_night_light()
+def _start_opencv():
+    with startup_report.phase('import cv2', 'opencv'):
+        import cv2
+
+def _start_camera(cfg):
+    with startup_report.phase('import picamera2'):
+        import picamera2
+    with startup_report.phase('camera start', 'camera'):
+        return setup_camera(cfg)
+
+def _start_gpio(cfg):
+    with startup_report.phase('gpio setup', 'gpio'):
+        import buzzer
+        if cfg['alarm']['enabled']:
+            buzzer.setup_gpio()
+        setup_night_light()
+        activate_night_light()
+
+def start_hardware(cfg):
+    """Bring up OpenCV, the camera and GPIO concurrently; returns the camera.
+
+    Raises the first failure so the motion thread can report it. All three
+    steps run to completion either way; if the camera came up but another
+    step failed, it is stopped and closed again before raising.
+    """
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix='startup') as pool:
+        cv_fut = pool.submit(_start_opencv)
+        cam_fut = pool.submit(_start_camera, cfg)
+        gpio_fut = pool.submit(_start_gpio, cfg)
+        try:
+            cv_fut.result()
+            gpio_fut.result()
+        except Exception:
+            if cam_fut.exception() is None:
+                picam2 = cam_fut.result()
+                picam2.stop()
+                picam2.close()
+            raise
+        return cam_fut.result()
+
+def motion_loop(server_cfg, cfg):
+    logger = logging.getLogger('motion-thread')
+    startup_report.set_state('motion', 'starting')
+    try:
+        picam2 = start_hardware(cfg)
+    except Exception as e:
+        logger.exception("Hardware startup failed")
+        startup_report.set_state('motion', 'failed', e)
+        # GPIO may be half set up (night light on, actuator thread running)
+        actuators.shutdown()
+        return
+
+    import cv2
+    from buzzer import setup_gpio, activate_siren, deactivate_siren
+    from detector import CascadeDetector
+    from duty_cycle import DutyCycle
 
-    prev = cv2.cvtColor(picam2.capture_array(), cv2.COLOR_RGB2BGR)
+    global detector, duty_cycle
+    md = cfg['motion_detection']
+    detector = CascadeDetector(md['min_area'], md['prefilter_scale'], md['prefilter_ratio'])
+    duty_cycle = DutyCycle(cfg['camera']['fps'], md['idle_fps'], md['idle_after'], md['ramp'])
+    detector.detect(cv2.cvtColor(picam2.capture_array(), cv2.COLOR_RGB2BGR))
     motion_count = 0
     recording = False
     frames_buf = []
     last_motion = time.time()
     alarm_started = None
-    threshold = 3
+    next_detect = 0.0
 
     img_dir = os.path.join(server_cfg['base_dir'], server_cfg['motion_images_dir'])
     vid_dir = os.path.join(server_cfg['base_dir'], server_cfg['motion_videos_dir'])
     os.makedirs(img_dir, exist_ok=True)
     os.makedirs(vid_dir, exist_ok=True)
+    startup_report.set_state('motion', 'ready')
 
     try:
         while not stop_event.is_set():
-            frame = cv2.cvtColor(picam2.capture_array(), cv2.COLOR_RGB2BGR)
-            with frame_lock:
-                global latest_frame
+            tick_start = time.monotonic()
+            new_cfg = take_pending_motion_config()
+            if new_cfg is not None:
+                changed = diff_motion_config(cfg, new_cfg)
+                if changed:
+                    logger.info("Applying config changes: %s", ', '.join(sorted(changed)))
+                # Only rebuild what the changed keys actually touch
+                if any(k.startswith('camera.resolution.') for k in changed):
+                    if recording:
+                        event_bus.publish('new_event', event=save_video(frames_buf, cfg, vid_dir, img_dir))
+                        frames_buf = []
+                        motion_count = 0
+                        recording = False
+                        publish_state('motion_stop', recording=False)
+                    # Reconfigure the open camera: a second Picamera2()
+                    # cannot acquire the device while this one holds it
+                    picam2.stop()
+                    configure_camera(picam2, new_cfg)
+                    picam2.start()
+                    detector.reset()
+                md = new_cfg['motion_detection']
+                detector.configure(md['min_area'], md['prefilter_scale'], md['prefilter_ratio'])
+                duty_cycle.configure(new_cfg['camera']['fps'], md['idle_fps'], md['idle_after'], md['ramp'])
+                if 'alarm.enabled' in changed:
+                    if new_cfg['alarm']['enabled']:
+                        setup_gpio()
+                    else:
+                        deactivate_siren()
+                        alarm_started = None
+                        publish_state('alarm', alarm=False)
+                cfg = new_cfg
+
+            with tracer.span('capture_array'):
+                raw = picam2.capture_array()
+            with tracer.span('cvtColor'):
+                frame = cv2.cvtColor(raw, cv2.COLOR_RGB2BGR)
+            with tracer.locked(frame_lock, 'frame_lock.wait'):
+                global latest_frame, frame_seq
                 latest_frame = frame.copy()
-            if detect_motion(prev, frame, motion_cfg['motion_detection']['min_area']):
-                motion_count += 1
-                frames_buf.append(frame)
-                last_motion = time.time()
-                if not recording and motion_count >= threshold:
-                    recording = True
-                    frames_buf = [frame]
-                    logger.info("Started recording")
-                    if motion_cfg['alarm']['enabled'] and alarm_started is None:
-                        activate_siren()
-                        alarm_started = time.time()
-            elif recording and (time.time() - last_motion) >= 2:
-                logger.info("Stopping recording & saving")
-                save_video(frames_buf, motion_cfg, vid_dir)
-                frames_buf = []
-                motion_count = 0
-                recording = False
-                # Explicitly deactivate siren here
-                if motion_cfg['alarm']['enabled']:
-                    deactivate_siren()
-                alarm_started = None
-
-            if alarm_started and (time.time() - alarm_started) >= motion_cfg['alarm']['duration']:
+                frame_seq += 1
+            # Capture and the live view always run at full fps; only the
+            # detection work is duty-cycled, so a quiet scene doesn't slow
+            # /video_feed down to idle_fps
+            if tick_start >= next_detect:
+                cpu_start = time.thread_time()
+                with tracer.span('detect_motion'):
+                    motion = detector.detect(frame)
+                if motion:
+                    motion_count += 1
+                    frames_buf.append(frame)
+                    last_motion = time.time()
+                    if not recording and motion_count >= cfg['motion_detection']['threshold']:
+                        recording = True
+                        frames_buf = [frame]
+                        logger.info("Started recording")
+                        publish_state('motion_start', recording=True)
+                        if cfg['alarm']['enabled'] and alarm_started is None:
+                            activate_siren()
+                            alarm_started = time.time()
+                            publish_state('alarm', alarm=True)
+                elif recording and (time.time() - last_motion) >= cfg['motion_detection']['cooldown']:
+                    logger.info("Stopping recording & saving")
+                    event_bus.publish('new_event', event=save_video(frames_buf, cfg, vid_dir, img_dir))
+                    frames_buf = []
+                    motion_count = 0
+                    recording = False
+                    publish_state('motion_stop', recording=False)
+                    # Explicitly deactivate siren here
+                    if cfg['alarm']['enabled']:
+                        deactivate_siren()
+                    if alarm_started is not None:
+                        publish_state('alarm', alarm=False)
+                    alarm_started = None
+
+                # Full rate while anything moves or we are recording (so clips
+                # keep full-rate footage), dropping towards idle_fps when quiet
+                interval = duty_cycle.update(detector.changed or recording)
+                # Half a frame of slack so capture jitter can't push a
+                # detection to the following frame
+                next_detect = tick_start + interval - 0.5 / cfg['camera']['fps']
+                duty_cycle.account(time.thread_time() - cpu_start, interval)
+
+            if alarm_started and (time.time() - alarm_started) >= cfg['alarm']['duration']:
                 deactivate_siren()
                 alarm_started = None
+                publish_state('alarm', alarm=False)
 
-            prev = frame
-            time.sleep(1.0 / motion_cfg['camera']['fps'])
+            frame_interval = 1.0 / cfg['camera']['fps']
+            stop_event.wait(max(0.0, frame_interval - (time.monotonic() - tick_start)))
 
     except Exception as e:
         logger.exception("Motion thread error")
+        startup_report.set_state('motion', 'failed', e)
     finally:
-        if motion_cfg['alarm']['enabled']:
+        if cfg['alarm']['enabled']:
             deactivate_siren()
         deactivate_night_light()
         picam2.stop()
-        GPIO.cleanup()
+        picam2.close()
+        actuators.shutdown()
         logger.info("Motion thread exiting")
 
 # -----------------------------------------------------------------------------
 # Flask web server
 # -----------------------------------------------------------------------------
 app = Flask(__name__)
-server_cfg = load_server_config()
-motion_cfg = load_motion_config()
+server_cfg = None
+motion_cfg = None
 app.secret_key = os.urandom(24)
-USERS = server_cfg['users']
+# Keep browsers from attaching the login to cross-site POSTs
+app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+
+# Short-lived signed tokens let the separate MJPEG server trust a viewer
+# that Flask has already authenticated
+STREAM_TOKEN_MAX_AGE = 60
+stream_tokens = URLSafeTimedSerializer(app.secret_key, salt='mjpeg-stream')
+mjpeg_server = None
+offloader    = None
+
+# Each open events page holds a web worker thread for its SSE feed; cap them
+# so a few forgotten tabs can't take the whole waitress pool
+MAX_EVENT_STREAMS = 4
+event_stream_slots = threading.BoundedSemaphore(MAX_EVENT_STREAMS)
+
+# Each export holds a web worker thread and streams from the SD card for as
+# long as the download runs; cap them so pages stay responsive
+MAX_EXPORTS = 2
+export_slots = threading.BoundedSemaphore(MAX_EXPORTS)
+
+def load_configs():
+    global server_cfg, motion_cfg
+    with startup_report.phase('load config', 'config'):
+        server_cfg = load_server_config()
+        motion_cfg = load_motion_config()
+
+@app.before_request
+def trace_request_start():
+    if tracer.enabled:
+        g.trace_span = tracer.span(f"http {request.endpoint}", {'path': request.path})
+        g.trace_span.__enter__()
+
+@app.teardown_request
+def trace_request_end(exc):
+    span = g.pop('trace_span', None)
+    if span is not None:
+        span.__exit__(None, None, None)
 
 def login_required(f):
     @wraps(f)
@@ -345,7 +477,8 @@ def login():
     if request.method == 'POST':
         u = request.form['username']
         p = request.form['password']
-        if u in USERS and check_password_hash(USERS[u], p):
+        users = server_cfg['users']
+        if u in users and check_password_hash(users[u], p):
             session['username'] = u
             return redirect(url_for('events'))
         return 'Invalid credentials', 401
@@ -356,6 +489,24 @@ def logout():
     session.pop('username', None)
     return redirect(url_for('login'))
 
+@app.route('/health')
+def health():
+    """Per-component readiness and startup phase timings.
+
+    Unauthenticated so watchdogs can poll it; returns 503 until every
+    component is ready.
+    """
+    snap = startup_report.snapshot()
+    if detector is not None:
+        snap['detector'] = dict(detector.stats)
+    if duty_cycle is not None:
+        snap['duty_cycle'] = duty_cycle.report()
+    if mjpeg_server is not None:
+        snap['stream'] = mjpeg_server.report()
+    if offloader is not None:
+        snap['offload'] = offloader.report()
+    return jsonify(snap), (200 if snap['ready'] else 503)
+
 @app.route('/')
 @login_required
 def home():
@@ -364,35 +515,37 @@ def home():
 @app.route('/events')
 @login_required
 def events():
-    evs = []
-    vd = os.path.join(server_cfg['base_dir'], server_cfg['motion_videos_dir'])
-    for f in sorted(os.listdir(vd), reverse=True):
-        if not f.lower().endswith('.avi'):
-            continue
-        # motion_20250422_183045.avi  →  raw_ts = "20250422_183045"
-        raw_ts = f.rsplit('_', 1)[-1].rsplit('.', 1)[0]
-        ts = parse_timestamp(raw_ts)
-        evs.append({
-            'timestamp': ts,
-            'type': 'video',
-            'filename': f
-        })
-
-    fd = os.path.join(server_cfg['base_dir'], server_cfg['motion_images_dir'])
-    for d in sorted(os.listdir(fd), reverse=True):
-        p = os.path.join(fd, d)
-        if not os.path.isdir(p):
-            continue
-        ts = parse_timestamp(d)       # now handles both formats
-        cnt = len([x for x in os.listdir(p) if x.endswith('.jpg')])
-        evs.append({
-            'timestamp': ts,
-            'type': 'frames',
-            'filename': d,
-            'frame_count': cnt
-        })
-
-    return render_template('events.html', events=evs)
+    return render_template('events.html', events=list_events(server_cfg))
+
+@app.route('/events/stream')
+@login_required
+def event_stream():
+    """Server-Sent Events feed of motion/alarm state and new recordings.
+
+    503 once MAX_EVENT_STREAMS pages are connected; the page then just stops
+    updating live.
+    """
+    if not event_stream_slots.acquire(blocking=False):
+        return 'Too many live event streams open', 503
+    def gen():
+        sub = event_bus.subscribe()
+        try:
+            yield 'retry: 3000\n\n'
+            yield f"event: status\ndata: {json.dumps({'type': 'status', **live_state})}\n\n"
+            while not stop_event.is_set():
+                msg = sub.get(timeout=15)
+                if msg is None:
+                    # Comment line keeps proxies from timing out and lets us
+                    # notice disconnected clients
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"event: {msg['type']}\ndata: {json.dumps(msg)}\n\n"
+        finally:
+            event_bus.unsubscribe(sub)
+    resp = Response(gen(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    resp.call_on_close(event_stream_slots.release)
+    return resp
 
 @app.route('/frames/<event_dir>')
 @login_required
@@ -419,20 +572,176 @@ def serve_video(video_file):
     path = os.path.join(server_cfg['base_dir'], server_cfg['motion_videos_dir'], video_file)
     return send_file(path) if os.path.exists(path) else ('Not found', 404)
 
+def export_response(chunks, filename, mimetype):
+    """Stream `chunks` as a download in one of the export slots, or 503
+    if they are all taken."""
+    if not export_slots.acquire(blocking=False):
+        return 'Too many exports in progress, try again shortly', 503
+    resp = Response(chunks, mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"',
+                             'X-Accel-Buffering': 'no'})
+    resp.call_on_close(export_slots.release)
+    return resp
+
+def export_bounds():
+    """(start, end) from ?start=&end=; end defaults to the end of start's
+    day. Raises ValueError on a missing or malformed bound."""
+    start = parse_bound(request.args.get('start', ''))
+    end = request.args.get('end')
+    return start, (parse_bound(end, end=True) if end else end_of_day(start))
+
+BAD_RANGE = 'start (and optionally end) must be YYYYMMDD[_HHMMSS] or ISO 8601'
+
+@app.route('/export/frames/<event_dir>.zip')
+@login_required
+def export_frames(event_dir):
+    event = frames_event(event_dir, 0)
+    if event_dir.startswith('.') or not os.path.isdir(event_path(server_cfg, event)):
+        return 'Not found', 404
+    return export_response(zip_stream(zip_members(server_cfg, [event])),
+                           f"{event_dir}.zip", 'application/zip')
+
+@app.route('/export/range.zip')
+@login_required
+def export_range_zip():
+    """Every event (frames, videos and sidecars) that started in the range."""
+    try:
+        start, end = export_bounds()
+    except ValueError:
+        return BAD_RANGE, 400
+    evs = range_events(server_cfg, start, end)
+    if not evs:
+        return 'No events in range', 404
+    name = f"events_{start:%Y%m%d_%H%M%S}-{end:%Y%m%d_%H%M%S}.zip"
+    return export_response(zip_stream(zip_members(server_cfg, evs)), name, 'application/zip')
+
+@app.route('/export/range.mkv')
+@login_required
+def export_range_clip():
+    """The video events in the range remuxed, without re-encoding, into
+    one clip."""
+    try:
+        start, end = export_bounds()
+    except ValueError:
+        return BAD_RANGE, 400
+    if not ffmpeg_available():
+        return 'Clip export needs ffmpeg (sudo apt install ffmpeg)', 501
+    evs = range_events(server_cfg, start, end, kind='video')
+    if not evs:
+        return 'No videos in range', 404
+    name = f"motion_{start:%Y%m%d_%H%M%S}-{end:%Y%m%d_%H%M%S}.mkv"
+    return export_response(concat_stream([event_path(server_cfg, ev) for ev in evs]),
+                           name, 'video/x-matroska')
+
+YAML_MIMETYPES = ('application/yaml', 'application/x-yaml', 'text/yaml')
+
+def read_mapping_body():
+    """Parse a JSON or YAML request body that must be a mapping.
+
+    Returns (payload, None) or (None, error response). Other content types
+    get 415: a cross-site form can only send urlencoded, multipart or
+    text/plain bodies without a CORS preflight, so refusing those keeps the
+    session cookie alone from being enough to change settings.
+    """
+    if request.mimetype == 'application/json':
+        payload = request.get_json(silent=True)
+        if payload is None:
+            return None, (jsonify(error="invalid JSON"), 400)
+    elif request.mimetype in YAML_MIMETYPES:
+        try:
+            payload = yaml.safe_load(request.get_data(as_text=True))
+        except yaml.YAMLError as e:
+            return None, (jsonify(error=f"invalid YAML: {e}"), 400)
+    else:
+        return None, (jsonify(error="body must be application/json or application/yaml"), 415)
+    if not isinstance(payload, dict):
+        return None, (jsonify(error="body must be a mapping"), 400)
+    return payload, None
+
+@app.route('/api/config', methods=['GET', 'POST'])
+@login_required
+def api_config():
+    """Read or update the running motion config.
+
+    POST takes a (partial) config as JSON or YAML, merges it over the current
+    one, validates it, persists it and queues it for the motion thread.
+    """
+    if request.method == 'GET':
+        return jsonify(motion_cfg)
+    payload, error = read_mapping_body()
+    if error:
+        return error
+    with config_update_lock:
+        with config_lock:
+            current = motion_cfg
+        try:
+            new_cfg = validate_motion_config(merge_config(current, payload))
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+        save_motion_config(new_cfg)
+        submit_motion_config(new_cfg)
+    return jsonify(status='accepted', changed=sorted(diff_motion_config(current, new_cfg)))
+
+@app.route('/admin/trace', methods=['GET', 'POST'])
+@login_required
+def admin_trace():
+    """Show or change tracing state; POST {"enabled": bool, "window": seconds}."""
+    if request.method == 'POST':
+        payload, error = read_mapping_body()
+        if error:
+            return error
+        enabled = payload.get('enabled')
+        if isinstance(enabled, str):
+            enabled = enabled.lower() in ('1', 'true', 'on', 'yes')
+        window = payload.get('window')
+        if window is not None:
+            try:
+                window = float(window)
+            except (TypeError, ValueError):
+                window = None
+            if window is None or not 0 < window < float('inf'):
+                return jsonify(error="window must be a positive number of seconds"), 400
+        tracer.configure(enabled=enabled, window=window)
+    return jsonify(tracer.status())
+
+@app.route('/admin/trace.json')
+@login_required
+def admin_trace_export():
+    """Download the buffered spans as Chrome trace / Perfetto JSON."""
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return Response(json.dumps(tracer.export()), mimetype='application/json',
+                    headers={'Content-Disposition': f'attachment; filename="trace_{ts}.json"'})
+
 @app.route('/video_feed')
 @login_required
 def video_feed():
+    if mjpeg_server is not None:
+        # Production mode: hand the viewer to the dedicated stream server.
+        # It only speaks plain HTTP; behind a TLS proxy set server.stream_url
+        # to the proxied address instead.
+        token = stream_tokens.dumps(session['username'])
+        base = server_cfg['server'].get('stream_url')
+        if not base:
+            host = urlsplit(request.host_url).hostname
+            if ':' in host:
+                host = f"[{host}]"
+            base = f"http://{host}:{mjpeg_server.port}"
+        return redirect(f"{base.rstrip('/')}/stream?token={token}")
+
+    import cv2
     def gen():
         while not stop_event.is_set():
-            with frame_lock:
+            with tracer.locked(frame_lock, 'frame_lock.wait'):
                 frm = latest_frame.copy() if latest_frame is not None else None
             if frm is None:
+                # Camera still starting up
+                time.sleep(0.1)
                 continue
-            ret, jpg = cv2.imencode('.jpg', frm)
+            with tracer.span('jpeg_encode'):
+                ret, jpg = cv2.imencode('.jpg', frm)
             if not ret:
                 continue
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + jpg.tobytes() + b'\r\n')
+            yield mjpeg_part(jpg.tobytes())
             time.sleep(1.0 / motion_cfg['camera']['fps'])
     return Response(gen(),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
@@ -440,21 +749,88 @@ def video_feed():
 # -----------------------------------------------------------------------------
 # Main entry: start thread + Flask, ensure cleanup on exit
 # -----------------------------------------------------------------------------
+def get_latest_frame():
+    with tracer.locked(frame_lock, 'frame_lock.wait'):
+        return frame_seq, latest_frame
+
+def check_stream_token(token):
+    try:
+        stream_tokens.loads(token, max_age=STREAM_TOKEN_MAX_AGE)
+    except BadSignature:
+        return False
+    return True
+
+def serve(server_cfg):
+    """Run the web server until interrupted.
+
+    'production' mode (the default) moves /video_feed viewers to an asyncio
+    MJPEG server on `stream_port` and serves the pages from waitress's fixed
+    thread pool when it is installed. 'development' keeps Flask's built-in
+    server for everything.
+    """
+    global mjpeg_server
+    srv = server_cfg['server']
+    host, port = srv['host'], srv['port']
+    if srv.get('mode', 'production') != 'production':
+        app.run(host=host, port=port)
+        return
+
+    mjpeg_server = MjpegServer(
+        get_latest_frame, check_stream_token,
+        lambda: motion_cfg['camera']['fps'],
+        host=host, port=srv.get('stream_port', port + 1),
+        max_clients=srv.get('max_viewers', 32),
+        write_timeout=srv.get('write_timeout', 5.0))
+    mjpeg_server.start()
+    try:
+        try:
+            from waitress import serve as waitress_serve
+        except ImportError:
+            logging.warning("waitress not installed, serving pages with the Flask development server")
+            app.run(host=host, port=port, threaded=True)
+        else:
+            # A low output high-water mark makes streamed exports wait for
+            # the client instead of waitress spooling them to a temp file
+            waitress_serve(app, host=host, port=port, threads=srv.get('threads', 16),
+                           channel_timeout=srv.get('write_timeout', 5.0) * 6,
+                           outbuf_high_watermark=512 * 1024)
+    finally:
+        mjpeg_server.stop()
+
+def start_offload():
+    """Start uploading events to object storage if configured. Runs in the
+    background: backfilling a large archive must not delay startup."""
+    global offloader
+    # Published before start() so shutdown can stop a long backfill
+    offloader = Offloader(server_cfg, event_bus)
+    try:
+        with startup_report.phase('offload start'):
+            offloader.start()
+    except Exception:
+        logging.exception("Event offload disabled: could not start uploader")
+        offloader.stop()
+
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
+    load_configs()
     motion_thread = threading.Thread(
         target=motion_loop,
         args=(server_cfg, motion_cfg),
         daemon=True
     )
     motion_thread.start()
+    config_watcher = MotionConfigWatcher(submit_motion_config)
+    config_watcher.start()
+    if (server_cfg.get('offload') or {}).get('enabled'):
+        threading.Thread(target=start_offload, name='offload-start', daemon=True).start()
 
+    startup_report.set_state('http', 'ready')
     try:
-        app.run(
-            host=server_cfg['server']['host'],
-            port=server_cfg['server']['port']
-        )
+        serve(server_cfg)
     finally:
         stop_event.set()
+        config_watcher.stop()
+        if offloader is not None:
+            offloader.stop()
         motion_thread.join()
         logging.info("Shutting down cleanly")
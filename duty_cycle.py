@@ -0,0 +1,64 @@
+import time
+
+
+class DutyCycle:
+    """Choose the detection rate: full fps while there is activity, dropping
+    to `idle_fps` once the scene has been quiet for a while.
+
+    Any activity switches straight back to full rate. After `idle_after`
+    quiet seconds the rate ramps down linearly over `ramp` seconds, so brief
+    pauses in movement don't cost full-rate frames at the start of the next.
+
+    Only detection is paced; capture keeps running at full fps for the live
+    view. `stats` estimates the CPU saved: every detection pass records the
+    thread CPU time it used and how many full-rate frames it stood in for.
+    """
+
+    def __init__(self, full_fps, idle_fps, idle_after, ramp):
+        self.configure(full_fps, idle_fps, idle_after, ramp)
+        self.mode = 'active'
+        self.fps = full_fps
+        self.last_active = time.monotonic()
+        self.stats = {'frames': 0, 'skipped_frames': 0.0, 'cpu_seconds': 0.0,
+                      'active_seconds': 0.0, 'ramp_seconds': 0.0, 'idle_seconds': 0.0}
+
+    def configure(self, full_fps, idle_fps, idle_after, ramp):
+        self.full_fps = full_fps
+        self.idle_fps = min(idle_fps, full_fps)
+        self.idle_after = idle_after
+        self.ramp = ramp
+
+    def update(self, active, now=None):
+        """Record whether this frame saw activity; return seconds until the next."""
+        now = time.monotonic() if now is None else now
+        if active:
+            self.last_active = now
+        quiet = now - self.last_active
+        if quiet < self.idle_after:
+            self.mode, self.fps = 'active', self.full_fps
+        elif quiet < self.idle_after + self.ramp:
+            frac = (quiet - self.idle_after) / self.ramp
+            self.mode = 'ramp'
+            self.fps = self.full_fps - (self.full_fps - self.idle_fps) * frac
+        else:
+            self.mode, self.fps = 'idle', self.idle_fps
+        return 1.0 / self.fps
+
+    def account(self, cpu_seconds, interval):
+        """Add one detection pass that used `cpu_seconds` and covers the
+        next `interval` seconds."""
+        s = self.stats
+        s['frames'] += 1
+        s['cpu_seconds'] += cpu_seconds
+        s['skipped_frames'] += max(0.0, interval * self.full_fps - 1)
+        s[f'{self.mode}_seconds'] += interval
+
+    def report(self):
+        s = dict(self.stats)
+        per_frame = s['cpu_seconds'] / s['frames'] if s['frames'] else 0.0
+        s['mode'] = self.mode
+        s['fps'] = round(self.fps, 2)
+        s['est_cpu_saved_seconds'] = round(s['skipped_frames'] * per_frame, 3)
+        for key in ('skipped_frames', 'cpu_seconds', 'active_seconds', 'ramp_seconds', 'idle_seconds'):
+            s[key] = round(s[key], 3)
+        return s
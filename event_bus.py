@@ -0,0 +1,61 @@
+import queue
+import threading
+import time
+
+
+class Subscription:
+    """One listener's bounded mailbox.
+
+    If a slow client lets it fill up, the oldest message is dropped so the
+    publisher (the capture thread) never blocks and memory stays bounded.
+    """
+
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+
+    def put(self, msg):
+        while True:
+            try:
+                self.queue.put_nowait(msg)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Next message, or None if nothing arrived within `timeout`."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """In-process publish/subscribe for pipeline events (motion, alarm, files)."""
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self.lock = threading.Lock()
+        self.subscribers = set()
+
+    def subscribe(self):
+        sub = Subscription(self.max_queue)
+        with self.lock:
+            self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.lock:
+            self.subscribers.discard(sub)
+
+    def publish(self, kind, **data):
+        msg = {'type': kind, 'time': time.time(), **data}
+        with self.lock:
+            subs = list(self.subscribers)
+        for sub in subs:
+            sub.put(msg)
+        return msg
@@ -0,0 +1,88 @@
+import os
+from datetime import datetime
+
+# Recorded events live on disk as either
+#   <videos_dir>/motion_YYYYMMDD_HHMMSS.avi    (type 'video')
+#   <images_dir>/YYYYMMDD_HHMMSS/frame_NNN.jpg (type 'frames')
+# with optional sidecar files <name>.<kind>.json next to them.
+
+SIDECAR_KINDS = ('redetect',)
+
+def parse_timestamp(name: str) -> str:
+    """
+    Try to parse `name` as either YYYYMMDD_HHMMSS or YYYYMMDD.
+    If that fails, return the raw `name`.
+    """
+    dt = event_time(name)
+    if dt is None:
+        return name
+    return dt.strftime("%Y-%m-%d %H:%M:%S" if '_' in name else "%Y-%m-%d")
+
+def event_time(raw_ts):
+    """datetime for a YYYYMMDD_HHMMSS / YYYYMMDD stamp, or None."""
+    for fmt in ("%Y%m%d_%H%M%S", "%Y%m%d"):
+        try:
+            return datetime.strptime(raw_ts, fmt)
+        except ValueError:
+            continue
+    return None
+
+def video_event(filename):
+    # motion_20250422_183045.avi  →  raw_ts = "20250422_183045"
+    stem = filename.rsplit('.', 1)[0]
+    raw_ts = stem[len('motion_'):] if stem.startswith('motion_') else stem
+    return {'timestamp': parse_timestamp(raw_ts), 'raw_ts': raw_ts,
+            'type': 'video', 'filename': filename}
+
+def frames_event(dirname, frame_count):
+    return {'timestamp': parse_timestamp(dirname), 'raw_ts': dirname,
+            'type': 'frames', 'filename': dirname, 'frame_count': frame_count}
+
+def event_dirs(server_cfg):
+    """(images_dir, videos_dir) from the server config."""
+    return (os.path.join(server_cfg['base_dir'], server_cfg['motion_images_dir']),
+            os.path.join(server_cfg['base_dir'], server_cfg['motion_videos_dir']))
+
+def event_path(server_cfg, event):
+    img_dir, vid_dir = event_dirs(server_cfg)
+    return os.path.join(vid_dir if event['type'] == 'video' else img_dir, event['filename'])
+
+def sidecar_path(server_cfg, event, kind):
+    """Path of the `kind` sidecar (e.g. 'redetect') stored next to an event."""
+    path = event_path(server_cfg, event)
+    if event['type'] == 'video':
+        path = path.rsplit('.', 1)[0]
+    return f"{path}.{kind}.json"
+
+def event_files(server_cfg, event):
+    """Every file belonging to an event: the video or its frames, plus
+    any sidecars."""
+    path = event_path(server_cfg, event)
+    if event['type'] == 'video':
+        files = [path] if os.path.isfile(path) else []
+    else:
+        files = [os.path.join(path, f) for f in frame_files(path)] if os.path.isdir(path) else []
+    for kind in SIDECAR_KINDS:
+        sidecar = sidecar_path(server_cfg, event, kind)
+        if os.path.exists(sidecar):
+            files.append(sidecar)
+    return files
+
+def frame_files(path):
+    """Sorted JPEG names inside an image event directory."""
+    return sorted(f for f in os.listdir(path) if f.endswith('.jpg'))
+
+def list_events(server_cfg):
+    """All recorded events, videos first, each group newest first."""
+    img_dir, vid_dir = event_dirs(server_cfg)
+    evs = []
+    if os.path.isdir(vid_dir):
+        for f in sorted(os.listdir(vid_dir), reverse=True):
+            if f.lower().endswith('.avi'):
+                evs.append(video_event(f))
+    if os.path.isdir(img_dir):
+        for d in sorted(os.listdir(img_dir), reverse=True):
+            p = os.path.join(img_dir, d)
+            if os.path.isdir(p):
+                evs.append(frames_event(d, len(frame_files(p))))
+    return evs
@@ -0,0 +1,158 @@
+import logging
+import os
+import re
+import shutil
+import subprocess
+import zipfile
+from datetime import datetime, timedelta
+
+from event_store import event_time, event_files, list_events
+
+logger = logging.getLogger('export')
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _Sink:
+    """Write-only, non-seekable buffer for zipfile.
+
+    zipfile detects that it cannot seek and writes sizes and CRCs in data
+    descriptors after each member, so the archive can be produced front to
+    back. The generator drains the buffer after every chunk, which keeps
+    memory at about one chunk whatever the size of the export.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+# Time part of an ISO 8601 bound, to tell how precisely it was given
+_ISO_TIME = re.compile(r'[T ]\d{2}(:?\d{2})?(:?\d{2})?')
+
+def parse_bound(value, end=False):
+    """Naive local datetime for a range bound given as YYYYMMDD[_HHMMSS] or
+    ISO 8601 (as sent by <input type="datetime-local">). Raises ValueError.
+
+    An end bound covers the whole unit it was given to, so a bare date runs
+    to 23:59:59 and 18:45 to 18:45:59. Bounds with a UTC offset are
+    converted to local time, which is what event names are stamped in.
+    """
+    dt = event_time(value)
+    if dt is not None:
+        unit = timedelta(days=1) if '_' not in value else timedelta(seconds=1)
+    else:
+        dt = datetime.fromisoformat(value)
+        if dt.tzinfo is not None:
+            dt = dt.astimezone().replace(tzinfo=None)
+        m = _ISO_TIME.search(value)
+        if m is None:
+            unit = timedelta(days=1)
+        elif m.group(2):
+            unit = timedelta(seconds=1)
+        elif m.group(1):
+            unit = timedelta(minutes=1)
+        else:
+            unit = timedelta(hours=1)
+    if end:
+        dt += unit - timedelta(seconds=1)
+    return dt
+
+def end_of_day(dt):
+    return dt.replace(hour=23, minute=59, second=59, microsecond=0)
+
+def range_events(server_cfg, start, end, kind=None):
+    """Events that started within [start, end], oldest first, optionally
+    only those of one type ('video' or 'frames')."""
+    picked = []
+    for ev in list_events(server_cfg):
+        ts = event_time(ev['raw_ts'])
+        if ts is None or not start <= ts <= end:
+            continue
+        if kind is None or ev['type'] == kind:
+            picked.append((ts, ev))
+    picked.sort(key=lambda p: (p[0], p[1]['type']))
+    return [ev for _, ev in picked]
+
+def zip_members(server_cfg, events):
+    """(arcname, path) for every file of `events`, named relative to
+    base_dir so the archive mirrors the layout on disk."""
+    base = server_cfg['base_dir']
+    for ev in events:
+        for path in event_files(server_cfg, ev):
+            yield os.path.relpath(path, base).replace(os.sep, '/'), path
+
+def zip_stream(members, chunk_size=CHUNK_SIZE):
+    """Yield a ZIP archive of `members` chunk by chunk.
+
+    Entries are stored, not deflated: JPEG and the recorded video are
+    already compressed, so deflating would only cost the Pi CPU. Files that
+    vanish before they are reached (e.g. evicted after offload) are skipped.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as zf:
+        for arcname, path in members:
+            try:
+                src = open(path, 'rb')
+            except FileNotFoundError:
+                logger.warning("Skipping %s: removed before export", path)
+                continue
+            with src:
+                info = zipfile.ZipInfo.from_file(path, arcname)
+                with zf.open(info, 'w') as dst:
+                    while True:
+                        data = src.read(chunk_size)
+                        if not data:
+                            break
+                        dst.write(data)
+                        yield sink.drain()
+            yield sink.drain()
+    # Central directory
+    yield sink.drain()
+
+def ffmpeg_available():
+    return shutil.which('ffmpeg') is not None
+
+def concat_stream(paths, chunk_size=CHUNK_SIZE):
+    """Yield `paths` remuxed into one Matroska clip by ffmpeg.
+
+    Streams are copied, not re-encoded, so this costs little more CPU than
+    reading the files. The concat list goes in on stdin as file: URLs
+    (plain paths would be resolved against "pipe:") and the clip comes out
+    on stdout; Matroska, unlike AVI, can be written without seeking back.
+    ffmpeg is killed if the client goes away.
+    """
+    listing = ''.join("file 'file:{}'\n".format(os.path.abspath(p).replace("'", "'\\''"))
+                      for p in paths)
+    proc = subprocess.Popen(
+        ['ffmpeg', '-hide_banner', '-loglevel', 'error',
+         '-f', 'concat', '-safe', '0', '-protocol_whitelist', 'file,pipe', '-i', 'pipe:0',
+         '-c', 'copy', '-f', 'matroska', 'pipe:1'],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        proc.stdin.write(listing.encode())
+        proc.stdin.close()
+        while True:
+            data = proc.stdout.read(chunk_size)
+            if not data:
+                break
+            yield data
+        if proc.wait() != 0:
+            logger.warning("ffmpeg exited with status %d while exporting %d clips",
+                           proc.returncode, len(paths))
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Measure live-feed and page latency with N simultaneous MJPEG viewers.
+
+Logs in, opens N /video_feed streams (following the redirect to the stream
+server in production mode) and, while they run, times requests to a page so
+you can see whether streaming starves the rest of the site.
+
+    python3 loadtest_stream.py http://pi:8087 -u admin -p secret -n 30 -d 60
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit, urlencode
+
+
+def connect(url, timeout):
+    u = urlsplit(url)
+    cls = http.client.HTTPSConnection if u.scheme == 'https' else http.client.HTTPConnection
+    return cls(u.hostname, u.port, timeout=timeout), (u.path or '/') + (f"?{u.query}" if u.query else '')
+
+def login(base, username, password, timeout):
+    conn, _ = connect(base, timeout)
+    body = urlencode({'username': username, 'password': password})
+    conn.request('POST', '/login', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+    resp = conn.getresponse()
+    resp.read()
+    cookie = resp.getheader('Set-Cookie')
+    if resp.status not in (200, 302) or not cookie:
+        raise SystemExit(f"Login failed: HTTP {resp.status}")
+    return cookie.split(';', 1)[0]
+
+def feed_url(base, cookie, timeout):
+    """URL a viewer should open: the stream server in production mode, or
+    /video_feed itself when the dev server streams directly."""
+    conn, _ = connect(base, timeout)
+    conn.request('GET', '/video_feed', headers={'Cookie': cookie})
+    resp = conn.getresponse()
+    if resp.status == 302:
+        url = resp.getheader('Location')
+        conn.close()
+        return url
+    conn.close()
+    return base.rstrip('/') + '/video_feed'
+
+def percentiles(values):
+    if not values:
+        return 'n/a'
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return (f"p50={statistics.median(values) * 1000:.0f}ms p95={pick(0.95) * 1000:.0f}ms "
+            f"max={values[-1] * 1000:.0f}ms")
+
+
+class Viewer(threading.Thread):
+    def __init__(self, url, cookie, deadline, timeout):
+        super().__init__(daemon=True)
+        self.url, self.cookie, self.deadline, self.timeout = url, cookie, deadline, timeout
+        self.first_frame = None
+        self.gaps = []
+        self.ages = []
+        self.frames = 0
+        self.error = None
+
+    def run(self):
+        start = time.monotonic()
+        try:
+            conn, path = connect(self.url, self.timeout)
+            conn.request('GET', path, headers={'Cookie': self.cookie})
+            resp = conn.getresponse()
+            if resp.status != 200:
+                raise RuntimeError(f"HTTP {resp.status}")
+            last = None
+            while time.monotonic() < self.deadline:
+                if not resp.readline().startswith(b'--'):
+                    continue
+                length = stamp = None
+                while True:
+                    header = resp.readline().strip()
+                    if not header:
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    if name.lower() == 'content-length':
+                        length = int(value)
+                    elif name.lower() == 'x-timestamp':
+                        stamp = float(value)
+                if length is None:
+                    raise RuntimeError("stream parts carry no Content-Length")
+                resp.read(length)
+                now = time.monotonic()
+                if last is None:
+                    self.first_frame = now - start
+                else:
+                    self.gaps.append(now - last)
+                if stamp is not None:
+                    self.ages.append(max(0.0, time.time() - stamp))
+                last = now
+                self.frames += 1
+            conn.close()
+        except Exception as e:
+            self.error = str(e)
+
+
+def probe(base, path, cookie, deadline, timeout, results):
+    while time.monotonic() < deadline:
+        start = time.monotonic()
+        try:
+            conn, _ = connect(base, timeout)
+            conn.request('GET', path, headers={'Cookie': cookie})
+            conn.getresponse().read()
+            conn.close()
+            results.append(time.monotonic() - start)
+        except Exception:
+            results.append(float(timeout))
+        time.sleep(0.5)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('base', help="server URL, e.g. http://raspberrypi:8087")
+    parser.add_argument('-u', '--username', default='admin')
+    parser.add_argument('-p', '--password', required=True)
+    parser.add_argument('-n', '--viewers', type=int, default=10)
+    parser.add_argument('-d', '--duration', type=float, default=30.0, help="seconds")
+    parser.add_argument('--probe', default='/events', help="page to time while streaming")
+    parser.add_argument('--timeout', type=float, default=10.0)
+    args = parser.parse_args()
+
+    cookie = login(args.base, args.username, args.password, args.timeout)
+    url = feed_url(args.base, cookie, args.timeout)
+    print(f"Streaming from {url.split('?')[0]} with {args.viewers} viewers for {args.duration:.0f}s")
+
+    deadline = time.monotonic() + args.duration
+    viewers = [Viewer(url, cookie, deadline, args.timeout) for _ in range(args.viewers)]
+    for v in viewers:
+        v.start()
+    page_times = []
+    prober = threading.Thread(target=probe, daemon=True,
+                              args=(args.base, args.probe, cookie, deadline, args.timeout, page_times))
+    prober.start()
+    for v in viewers:
+        v.join(args.duration + args.timeout)
+    prober.join(args.timeout)
+
+    ok = [v for v in viewers if v.error is None and v.frames]
+    print(f"viewers ok: {len(ok)}/{len(viewers)}")
+    for v in viewers:
+        if v.error:
+            print(f"  error: {v.error}")
+    if ok:
+        fps = [v.frames / args.duration for v in ok]
+        print(f"fps per viewer: min={min(fps):.1f} avg={statistics.mean(fps):.1f}")
+        print(f"time to first frame: {percentiles([v.first_frame for v in ok])}")
+        print(f"frame gap: {percentiles([g for v in ok for g in v.gaps])}")
+        print(f"frame age (needs synced clocks): {percentiles([a for v in ok for a in v.ages])}")
+    print(f"{args.probe} latency: {percentiles(page_times)}")
+
+if __name__ == '__main__':
+    main()
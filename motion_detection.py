@@ -8,11 +8,10 @@ import logging
 import yaml
 from picamera2 import Picamera2
 from buzzer import setup_gpio, activate_siren, deactivate_siren
-import RPi.GPIO as GPIO
+import actuators
+from actuators import NIGHT_LIGHT_PIN
 import threading
 
-# Night light pin constant
-NIGHT_LIGHT_PIN = 7
 
 # Shared frame and lock for streaming
 latest_frame = None
@@ -22,20 +21,19 @@ motion_detection_running = True
 # --- GPIO / Light Setup ---
 def setup_night_light():
     """Setup GPIO pin for night light."""
-    GPIO.setmode(GPIO.BCM)
-    GPIO.setup(NIGHT_LIGHT_PIN, GPIO.OUT)
+    actuators.get_service()
     logging.getLogger('motion_detection').info("Night light initialized on PIN %s", NIGHT_LIGHT_PIN)
 
 
 def activate_night_light():
     """Turn on the night light."""
-    GPIO.output(NIGHT_LIGHT_PIN, GPIO.HIGH)
+    actuators.get_service().set('night_light', {NIGHT_LIGHT_PIN: 1})
     logging.getLogger('motion_detection').info("Night light activated")
 
 
 def deactivate_night_light():
     """Turn off the night light."""
-    GPIO.output(NIGHT_LIGHT_PIN, GPIO.LOW)
+    actuators.get_service().stop('night_light')
     logging.getLogger('motion_detection').info("Night light deactivated")
 
 # --- Configuration & Logging ---
@@ -176,7 +174,7 @@ def motion_detection_main():
         motion_detection_running = False
         if config['alarm']['enabled']: deactivate_siren()
         deactivate_night_light()
-        camera.stop(); GPIO.cleanup()
+        camera.stop(); actuators.shutdown()
         logger.info("Motion detection thread stopped")
 
 if __name__ == '__main__':
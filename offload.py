@@ -0,0 +1,376 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from event_store import list_events, event_files, event_path
+
+logger = logging.getLogger('offload')
+
+DEFAULT_OFFLOAD_CONFIG = {
+    'enabled': False,
+    'endpoint_url': None,       # e.g. http://nas:9000 for MinIO; None = AWS
+    'bucket': 'motion-events',
+    'prefix': '',
+    'region': None,
+    'access_key': None,
+    'secret_key': None,
+    'bandwidth_kbps': 0,        # total upload cap, 0 = unlimited
+    'concurrency': 2,           # files uploaded in parallel
+    'part_size_mb': 8,          # multipart chunk size (S3 minimum is 5)
+    'evict_local': False,       # delete local copies once confirmed uploaded
+    'backfill': True,           # queue events already on disk at startup
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    path         TEXT PRIMARY KEY,
+    key          TEXT NOT NULL,
+    event        TEXT NOT NULL,
+    state        TEXT NOT NULL DEFAULT 'pending',
+    upload_id    TEXT,
+    parts        TEXT NOT NULL DEFAULT '[]',
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    error        TEXT,
+    bytes        INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+class _Stopped(Exception):
+    pass
+
+
+# -----------------------------------------------------------------------------
+# Bandwidth limiting
+# -----------------------------------------------------------------------------
+class TokenBucket:
+    """Shared byte-rate limiter; rate <= 0 disables limiting."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(int(rate), 64 * 1024)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, n):
+        if self.rate <= 0:
+            return
+        while n > 0:
+            chunk = min(n, self.capacity)
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= chunk:
+                    self.tokens -= chunk
+                    n -= chunk
+                    continue
+                wait = (chunk - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class ThrottledReader:
+    """Seekable read-only view of `length` bytes of a file at `offset`.
+
+    Each byte is paid for in bucket tokens the first time it is read, so a
+    checksum pass followed by the actual send is not charged twice.
+    """
+
+    def __init__(self, path, offset, length, bucket):
+        self.f = open(path, 'rb')
+        self.offset = offset
+        self.length = length
+        self.bucket = bucket
+        self.pos = 0
+        self.paid = 0
+
+    def read(self, n=-1):
+        remaining = self.length - self.pos
+        if n is None or n < 0 or n > remaining:
+            n = remaining
+        unpaid = self.pos + n - self.paid
+        if unpaid > 0:
+            self.bucket.consume(unpaid)
+            self.paid += unpaid
+        self.f.seek(self.offset + self.pos)
+        data = self.f.read(n)
+        self.pos += len(data)
+        return data
+
+    def seek(self, pos, whence=0):
+        base = {0: 0, 1: self.pos, 2: self.length}[whence]
+        self.pos = max(0, min(self.length, base + pos))
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# -----------------------------------------------------------------------------
+# Uploader
+# -----------------------------------------------------------------------------
+class Offloader:
+    """Upload finished events to an S3-compatible bucket in the background.
+
+    Files are queued in a SQLite database next to the recordings, so the
+    queue, multipart upload ids and completed parts survive restarts and an
+    interrupted upload resumes at the next missing part. `concurrency`
+    worker threads share one bandwidth bucket. A file counts as uploaded
+    only once head_object reports the expected size, and local copies of an
+    event are removed (if `evict_local`) only when every one of its files
+    has been confirmed.
+    """
+
+    def __init__(self, server_cfg, bus=None, client=None):
+        opts = dict(DEFAULT_OFFLOAD_CONFIG)
+        opts.update(server_cfg.get('offload') or {})
+        self.opts = opts
+        self.server_cfg = server_cfg
+        self.bus = bus
+        self.client = client
+        self.part_size = max(5, int(opts['part_size_mb'])) * 1024 * 1024
+        self.bucket = TokenBucket(opts['bandwidth_kbps'] * 1024 / 8)
+        self.db_path = os.path.join(server_cfg['base_dir'], 'offload_queue.db')
+        self.db = None
+        self.db_lock = threading.Lock()
+        self.wakeup = threading.Condition()
+        self.stopping = threading.Event()
+        self.threads = []
+
+    # --- lifecycle ---
+    def start(self):
+        if self.client is None:
+            self.client = self._make_client()
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self.db_lock, self.db:
+            self.db.execute(SCHEMA)
+            # Uploads cut off by a restart continue from their saved parts
+            self.db.execute("UPDATE uploads SET state='pending' WHERE state='uploading'")
+        # Subscribe before taking the backfill snapshot: events saved while
+        # it runs wait in the subscription instead of being missed until the
+        # next restart (duplicates are ignored by the queue)
+        sub = self.bus.subscribe() if self.bus is not None else None
+        try:
+            if self.opts['backfill'] and not self._backfill(sub):
+                return
+            # Under db_lock so stop() either sees these threads or we see it
+            with self.db_lock:
+                if self.stopping.is_set():
+                    return
+                for i in range(max(1, int(self.opts['concurrency']))):
+                    t = threading.Thread(target=self._worker, name=f'offload-{i}', daemon=True)
+                    t.start()
+                    self.threads.append(t)
+                if sub is not None:
+                    t = threading.Thread(target=self._feed, args=(sub,), name='offload-feed', daemon=True)
+                    t.start()
+                    self.threads.append(t)
+                    sub = None  # the feeder owns it now
+        finally:
+            if sub is not None:
+                self.bus.unsubscribe(sub)
+        logger.info("Offloading to bucket %s with %d workers", self.opts['bucket'], self.opts['concurrency'])
+
+    def stop(self, timeout=10.0):
+        """Stop the workers and close the queue. Safe to call while start()
+        is still backfilling in another thread."""
+        self.stopping.set()
+        with self.wakeup:
+            self.wakeup.notify_all()
+        with self.db_lock:
+            threads = list(self.threads)
+        deadline = time.monotonic() + timeout
+        for t in threads:
+            t.join(max(0.0, deadline - time.monotonic()))
+        busy = sum(t.is_alive() for t in threads)
+        if busy:
+            # A worker stuck in a throttled part upload still needs the
+            # database to record it; the process exit will close it
+            logger.warning("%d offload workers still busy, leaving the queue open", busy)
+            return
+        with self.db_lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    def _make_client(self):
+        import boto3
+        from botocore.config import Config
+        kwargs = {'retries': {'max_attempts': 3},
+                  'max_pool_connections': int(self.opts['concurrency']) + 1}
+        try:
+            # Otherwise newer botocore reads every part once just to checksum it
+            config = Config(request_checksum_calculation='when_required', **kwargs)
+        except TypeError:
+            config = Config(**kwargs)
+        return boto3.client(
+            's3', endpoint_url=self.opts['endpoint_url'], region_name=self.opts['region'],
+            aws_access_key_id=self.opts['access_key'],
+            aws_secret_access_key=self.opts['secret_key'], config=config)
+
+    # --- queue ---
+    def object_key(self, path):
+        rel = os.path.relpath(path, self.server_cfg['base_dir']).replace(os.sep, '/')
+        return f"{self.opts['prefix']}{rel}"
+
+    def enqueue_event(self, event, notify=True):
+        self.enqueue_events([event], notify)
+
+    def enqueue_events(self, events, notify=True):
+        rows = []
+        for event in events:
+            ev_key = event_path(self.server_cfg, event)
+            rows += [(p, self.object_key(p), ev_key) for p in event_files(self.server_cfg, event)]
+        with self.db_lock:
+            if self.db is None:
+                return
+            with self.db:
+                self.db.executemany("INSERT OR IGNORE INTO uploads (path, key, event) VALUES (?, ?, ?)", rows)
+        if notify:
+            with self.wakeup:
+                self.wakeup.notify_all()
+
+    def report(self):
+        with self.db_lock:
+            if self.db is None:
+                return {'queue': {}, 'uploaded_bytes': 0}
+            counts = dict(self.db.execute("SELECT state, COUNT(*) FROM uploads GROUP BY state"))
+            uploaded = self.db.execute("SELECT COALESCE(SUM(bytes), 0) FROM uploads WHERE state='done'").fetchone()[0]
+        return {'queue': counts, 'uploaded_bytes': uploaded}
+
+    def _backfill(self, sub, batch=200, passes=3):
+        """Queue every event already on disk; False if stopped meanwhile.
+
+        Commits in batches to keep SD card writes down. `sub` only buffers
+        max_queue messages, so if it overflowed during a pass some new
+        events may have been lost from it and the archive is scanned again.
+        """
+        for _ in range(passes):
+            dropped = sub.dropped if sub is not None else 0
+            events = list_events(self.server_cfg)
+            for i in range(0, len(events), batch):
+                if self.stopping.is_set():
+                    return False
+                self.enqueue_events(events[i:i + batch], notify=False)
+            if sub is None or sub.dropped == dropped:
+                break
+            logger.info("Event feed overflowed during backfill, rescanning")
+        return True
+
+    def _feed(self, sub):
+        try:
+            while not self.stopping.is_set():
+                msg = sub.get(timeout=1.0)
+                if msg is not None and msg['type'] == 'new_event':
+                    self.enqueue_event(msg['event'])
+        finally:
+            self.bus.unsubscribe(sub)
+
+    def _claim(self):
+        with self.db_lock, self.db:
+            row = self.db.execute(
+                "SELECT path, key, event, upload_id, parts, attempts FROM uploads "
+                "WHERE state='pending' AND next_attempt <= ? ORDER BY rowid LIMIT 1",
+                (time.time(),)).fetchone()
+            if row is not None:
+                self.db.execute("UPDATE uploads SET state='uploading' WHERE path=?", (row[0],))
+        return row
+
+    def _update(self, path, **fields):
+        cols = ', '.join(f"{k}=?" for k in fields)
+        with self.db_lock, self.db:
+            self.db.execute(f"UPDATE uploads SET {cols} WHERE path=?", (*fields.values(), path))
+
+    # --- workers ---
+    def _worker(self):
+        while not self.stopping.is_set():
+            row = self._claim()
+            if row is None:
+                with self.wakeup:
+                    self.wakeup.wait(5.0)
+                continue
+            path, key, event, upload_id, parts, attempts = row
+            try:
+                if not os.path.exists(path):
+                    self._update(path, state='missing')
+                    continue
+                size = self._upload(path, key, upload_id, json.loads(parts))
+                self._update(path, state='done', error=None, bytes=size)
+                self._maybe_evict(event)
+            except _Stopped:
+                self._update(path, state='pending')
+            except Exception as e:
+                delay = min(600, 5 * 2 ** attempts)
+                logger.warning("Upload of %s failed (attempt %d), retrying in %ds: %s",
+                               path, attempts + 1, delay, e)
+                self._update(path, state='pending', attempts=attempts + 1,
+                             next_attempt=time.time() + delay, error=str(e))
+
+    def _upload(self, path, key, upload_id, parts):
+        bucket = self.opts['bucket']
+        size = os.path.getsize(path)
+        if size <= self.part_size:
+            with ThrottledReader(path, 0, size, self.bucket) as body:
+                self.client.put_object(Bucket=bucket, Key=key, Body=body, ContentLength=size)
+        else:
+            if upload_id is None:
+                upload_id = self.client.create_multipart_upload(Bucket=bucket, Key=key)['UploadId']
+                parts = []
+                self._update(path, upload_id=upload_id, parts='[]')
+            done = {p['PartNumber'] for p in parts}
+            try:
+                for number, offset in enumerate(range(0, size, self.part_size), 1):
+                    if number in done:
+                        continue
+                    if self.stopping.is_set():
+                        raise _Stopped()
+                    length = min(self.part_size, size - offset)
+                    with ThrottledReader(path, offset, length, self.bucket) as body:
+                        resp = self.client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id,
+                                                       PartNumber=number, Body=body, ContentLength=length)
+                    parts.append({'PartNumber': number, 'ETag': resp['ETag']})
+                    self._update(path, parts=json.dumps(parts))
+                self.client.complete_multipart_upload(
+                    Bucket=bucket, Key=key, UploadId=upload_id,
+                    MultipartUpload={'Parts': sorted(parts, key=lambda p: p['PartNumber'])})
+            except self.client.exceptions.NoSuchUpload:
+                # Expired or aborted server-side: start over on the next attempt
+                self._update(path, upload_id=None, parts='[]')
+                raise
+        head = self.client.head_object(Bucket=bucket, Key=key)
+        if head['ContentLength'] != size:
+            raise RuntimeError(f"uploaded size {head['ContentLength']} != local size {size}")
+        return size
+
+    def _maybe_evict(self, event):
+        if not self.opts['evict_local']:
+            return
+        with self.db_lock:
+            rows = self.db.execute("SELECT path, state FROM uploads WHERE event=?", (event,)).fetchall()
+        if any(state not in ('done', 'missing') for _, state in rows):
+            return
+        for path, _ in rows:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        if os.path.isdir(event):
+            try:
+                os.rmdir(event)
+            except OSError:
+                logger.warning("Not removing %s: it still holds files that were never queued", event)
+        logger.info("Evicted %s after confirmed upload", event)
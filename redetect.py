@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Re-run the current motion detector over recorded events.
+
+Every archived video / image event is scored with the detector settings from
+motion_config.yml, one process per core. Results are appended to a JSONL
+state file as they finish, so an interrupted run picks up where it stopped;
+events already scored with the same settings are skipped.
+
+    python3 redetect.py                   # score and report only
+    python3 redetect.py --action tag      # also write <event>.redetect.json
+    python3 redetect.py --action delete   # delete events that no longer trigger
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from detector import CascadeDetector
+from event_store import list_events, event_path, sidecar_path, frame_files
+from settings import load_server_config, read_motion_config, MOTION_CONFIG_PATH
+
+# Settings that change the verdict; results from other settings are redone
+DETECTOR_KEYS = ('min_area', 'threshold', 'prefilter_scale', 'prefilter_ratio')
+
+logger = logging.getLogger('redetect')
+
+
+# -----------------------------------------------------------------------------
+# Worker side
+# -----------------------------------------------------------------------------
+def iter_frames(path, kind):
+    if kind == 'video':
+        cap = cv2.VideoCapture(path)
+        try:
+            while True:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                yield frame
+        finally:
+            cap.release()
+    else:
+        for name in frame_files(path):
+            frame = cv2.imread(os.path.join(path, name))
+            if frame is not None:
+                yield frame
+
+def init_worker():
+    # Parallelism comes from the process pool; stop OpenCV from also
+    # spawning a thread per core inside every worker.
+    cv2.setNumThreads(1)
+
+def score_event(path, kind, md):
+    det = CascadeDetector(md['min_area'], md['prefilter_scale'], md['prefilter_ratio'])
+    frames = motion = max_area = 0
+    for frame in iter_frames(path, kind):
+        frames += 1
+        if det.detect(frame):
+            motion += 1
+        max_area = max(max_area, det.last_area)
+    return {
+        'frames': frames,
+        'motion_frames': motion,
+        'max_area': max_area,
+        # share of frame pairs that still count as motion
+        'score': round(motion / (frames - 1), 3) if frames > 1 else 0.0,
+        'triggers': motion >= md['threshold'],
+    }
+
+
+# -----------------------------------------------------------------------------
+# Driver side
+# -----------------------------------------------------------------------------
+def config_fingerprint(md):
+    blob = json.dumps({k: md[k] for k in DETECTOR_KEYS}, sort_keys=True)
+    return hashlib.sha1(blob.encode()).hexdigest()[:12]
+
+def event_key(ev):
+    return f"{ev['type']}:{ev['filename']}"
+
+def load_state(path):
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # torn last line from a killed run
+            done[rec['event']] = rec
+    return done
+
+def apply_action(action, server_cfg, ev, path, rec):
+    if rec['frames'] == 0:
+        return 'unreadable'
+    verdict = 'kept' if rec['triggers'] else 'rejected'
+    if action == 'tag':
+        with open(sidecar_path(server_cfg, ev, 'redetect'), 'w') as f:
+            json.dump(rec, f, indent=2)
+    elif action == 'delete' and verdict == 'rejected':
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+        sidecar = sidecar_path(server_cfg, ev, 'redetect')
+        if os.path.exists(sidecar):
+            os.remove(sidecar)
+        return 'deleted'
+    return verdict
+
+def fmt_eta(seconds):
+    m, s = divmod(int(seconds), 60)
+    h, m = divmod(m, 60)
+    return f"{h}:{m:02d}:{s:02d}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--action', choices=('report', 'tag', 'delete'), default='report',
+                        help="what to do with scored events (default: report)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: number of cores)")
+    parser.add_argument('--config', default=MOTION_CONFIG_PATH, help="motion config to take detector settings from")
+    parser.add_argument('--state', help="results/resume file (default: <base_dir>/redetect_state.jsonl)")
+    parser.add_argument('--limit', type=int, help="only process this many pending events")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server_cfg = load_server_config()
+    # No fallback to defaults here: --action delete with settings nobody
+    # chose could wipe the archive
+    try:
+        md = read_motion_config(args.config)['motion_detection']
+    except (OSError, ValueError) as e:
+        parser.error(f"cannot use motion config {args.config}: {e}")
+    fp = config_fingerprint(md)
+    state_path = args.state or os.path.join(server_cfg['base_dir'], 'redetect_state.jsonl')
+    done = load_state(state_path)
+
+    pending, rescored = [], []
+    for ev in list_events(server_cfg):
+        path = event_path(server_cfg, ev)
+        mtime = int(os.stat(path).st_mtime)
+        prev = done.get(event_key(ev))
+        if prev and prev['config'] == fp and prev['mtime'] == mtime:
+            # Already scored with these settings. Reuse the score, but still
+            # act on it if this run asks for something the earlier one
+            # didn't (e.g. a report run, then --action delete)
+            if args.action != 'report' and prev.get('mode') != args.action:
+                rescored.append((ev, path, prev))
+            continue
+        pending.append((ev, path, mtime))
+    if args.limit:
+        pending = pending[:args.limit]
+    logger.info("%d events to score, %d to %s from earlier scores (%d already done), "
+                "%d workers, settings %s", len(pending), len(rescored), args.action,
+                len(done), args.workers, fp)
+
+    counts = {}
+    started = time.monotonic()
+    pool = ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker)
+    try:
+        with open(state_path, 'a') as state:
+            for ev, path, prev in rescored:
+                rec = {k: v for k, v in prev.items() if k != 'action'}
+                rec['mode'] = args.action
+                rec['action'] = apply_action(args.action, server_cfg, ev, path, rec)
+                state.write(json.dumps(rec) + '\n')
+                state.flush()
+                counts[rec['action']] = counts.get(rec['action'], 0) + 1
+                logger.info("%s score=%.3f (earlier run) -> %s", ev['filename'], rec['score'], rec['action'])
+
+            futures = {pool.submit(score_event, path, ev['type'], md): (ev, path, mtime)
+                       for ev, path, mtime in pending}
+            for n, fut in enumerate(as_completed(futures), 1):
+                ev, path, mtime = futures[fut]
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    logger.error("Failed to score %s: %s", ev['filename'], e)
+                    continue
+                rec = {'event': event_key(ev), 'mtime': mtime, 'config': fp,
+                       'mode': args.action, **result}
+                rec['action'] = apply_action(args.action, server_cfg, ev, path, rec)
+                state.write(json.dumps(rec) + '\n')
+                state.flush()
+                counts[rec['action']] = counts.get(rec['action'], 0) + 1
+
+                rate = n / (time.monotonic() - started)
+                logger.info("[%d/%d] %s score=%.3f max_area=%d -> %s (%.1f ev/s, ETA %s)",
+                            n, len(pending), ev['filename'], rec['score'], rec['max_area'],
+                            rec['action'], rate, fmt_eta((len(pending) - n) / rate))
+    except KeyboardInterrupt:
+        logger.warning("Interrupted, rerun to resume")
+        pool.shutdown(wait=False, cancel_futures=True)
+        return 130
+    pool.shutdown()
+    logger.info("Done: %s", ', '.join(f"{k}={v}" for k, v in sorted(counts.items())) or 'nothing to do')
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
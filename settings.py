@@ -0,0 +1,199 @@
+import copy
+import logging
+import os
+import threading
+
+import yaml
+
+# -----------------------------------------------------------------------------
+# Paths & defaults
+# -----------------------------------------------------------------------------
+MOTION_CONFIG_DIR = 'config'
+MOTION_CONFIG_PATH = os.path.join(MOTION_CONFIG_DIR, 'motion_config.yml')
+SERVER_BASE_DIR = os.path.expanduser('~/project/Miro/')
+SERVER_CONFIG_PATH = os.path.join(SERVER_BASE_DIR, 'config', 'server_config.yml')
+
+DEFAULT_MOTION_CONFIG = {
+    'camera': {'resolution': {'width': 640, 'height': 360}, 'fps': 20},
+    'motion_detection': {'min_area': 2000, 'min_frames_for_video': 10, 'threshold': 3, 'cooldown': 2,
+                         'prefilter_scale': 4, 'prefilter_ratio': 0.25,
+                         'idle_fps': 2, 'idle_after': 10, 'ramp': 5},
+    'alarm': {'enabled': True, 'duration': 30}
+}
+
+logger = logging.getLogger('settings')
+
+
+# -----------------------------------------------------------------------------
+# Loaders
+# -----------------------------------------------------------------------------
+def load_server_config():
+    from werkzeug.security import generate_password_hash
+    default = {
+        'base_dir': SERVER_BASE_DIR,
+        'motion_images_dir': 'motion_images',
+        'motion_videos_dir': 'motion_videos',
+        'users': {'admin': generate_password_hash('admin')},
+        'server': {'host': '0.0.0.0', 'port': 8087}
+    }
+    os.makedirs(os.path.dirname(SERVER_CONFIG_PATH), exist_ok=True)
+    if not os.path.exists(SERVER_CONFIG_PATH):
+        with open(SERVER_CONFIG_PATH, 'w') as f:
+            yaml.dump(default, f)
+        return default
+    try:
+        with open(SERVER_CONFIG_PATH) as f:
+            cfg = yaml.safe_load(f) or default
+    except Exception:
+        cfg = default
+    return cfg
+
+
+def load_motion_config(path=MOTION_CONFIG_PATH):
+    """Load the motion config, creating it with defaults if missing.
+
+    Invalid or unreadable files fall back to the defaults so the camera can
+    still start; the hot-reload path uses `read_motion_config` instead, which
+    raises so a bad edit never replaces a working config.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if not os.path.exists(path):
+        default = copy.deepcopy(DEFAULT_MOTION_CONFIG)
+        with open(path, 'w') as f:
+            yaml.dump(default, f)
+        return default
+    try:
+        return read_motion_config(path)
+    except Exception as e:
+        logger.error("Error loading %s, using defaults: %s", path, e)
+        return copy.deepcopy(DEFAULT_MOTION_CONFIG)
+
+
+def read_motion_config(path=MOTION_CONFIG_PATH):
+    """Read and validate the motion config; raises ValueError on bad content."""
+    with open(path) as f:
+        try:
+            raw = yaml.safe_load(f) or {}
+        except yaml.YAMLError as e:
+            raise ValueError(f"invalid YAML: {e}")
+    return validate_motion_config(raw)
+
+
+def save_motion_config(cfg, path=MOTION_CONFIG_PATH):
+    """Write `cfg` atomically so the watcher never sees a half-written file."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        yaml.dump(cfg, f, default_flow_style=False)
+    os.replace(tmp, path)
+
+
+# -----------------------------------------------------------------------------
+# Validation & diffing
+# -----------------------------------------------------------------------------
+def merge_config(base, overrides):
+    """Return a deep copy of `base` with `overrides` applied recursively."""
+    out = copy.deepcopy(base)
+    for key, val in (overrides or {}).items():
+        if isinstance(val, dict) and isinstance(out.get(key), dict):
+            out[key] = merge_config(out[key], val)
+        else:
+            out[key] = copy.deepcopy(val)
+    return out
+
+
+def _check_number(cfg, section, key, minimum, integer=True):
+    val = cfg[section][key]
+    kinds = (int,) if integer else (int, float)
+    if isinstance(val, bool) or not isinstance(val, kinds):
+        raise ValueError(f"{section}.{key} must be a{'n integer' if integer else ' number'}")
+    if val < minimum:
+        raise ValueError(f"{section}.{key} must be >= {minimum}")
+
+
+def validate_motion_config(cfg):
+    """Fill in defaults and check types/ranges.
+
+    Returns a new dict; raises ValueError describing the first bad setting.
+    """
+    if not isinstance(cfg, dict):
+        raise ValueError("config must be a mapping")
+    for section, val in cfg.items():
+        if section in DEFAULT_MOTION_CONFIG and not isinstance(val, dict):
+            raise ValueError(f"{section} must be a mapping")
+    cfg = merge_config(DEFAULT_MOTION_CONFIG, cfg)
+
+    res = cfg['camera']['resolution']
+    if not isinstance(res, dict):
+        raise ValueError("camera.resolution must be a mapping")
+    for key in ('width', 'height'):
+        _check_number(cfg['camera'], 'resolution', key, 16)
+    _check_number(cfg, 'camera', 'fps', 1, integer=False)
+    _check_number(cfg, 'motion_detection', 'min_area', 0, integer=False)
+    _check_number(cfg, 'motion_detection', 'min_frames_for_video', 1)
+    _check_number(cfg, 'motion_detection', 'threshold', 1)
+    _check_number(cfg, 'motion_detection', 'cooldown', 0, integer=False)
+    _check_number(cfg, 'motion_detection', 'prefilter_scale', 1)
+    _check_number(cfg, 'motion_detection', 'prefilter_ratio', 0, integer=False)
+    _check_number(cfg, 'motion_detection', 'idle_fps', 0.1, integer=False)
+    _check_number(cfg, 'motion_detection', 'idle_after', 0, integer=False)
+    _check_number(cfg, 'motion_detection', 'ramp', 0, integer=False)
+    if not isinstance(cfg['alarm']['enabled'], bool):
+        raise ValueError("alarm.enabled must be true or false")
+    _check_number(cfg, 'alarm', 'duration', 0, integer=False)
+    return cfg
+
+
+def diff_motion_config(old, new, prefix=''):
+    """Return the set of dotted keys whose values differ between two configs."""
+    changed = set()
+    for key in set(old) | set(new):
+        a, b = old.get(key), new.get(key)
+        path = f"{prefix}{key}"
+        if isinstance(a, dict) and isinstance(b, dict):
+            changed |= diff_motion_config(a, b, path + '.')
+        elif a != b:
+            changed.add(path)
+    return changed
+
+
+# -----------------------------------------------------------------------------
+# File watcher
+# -----------------------------------------------------------------------------
+class MotionConfigWatcher(threading.Thread):
+    """Poll the motion config file and hand validated changes to `on_change`.
+
+    Polling the mtime keeps this dependency-free and costs one stat() per
+    interval. Edits that fail validation are logged and ignored.
+    """
+
+    def __init__(self, on_change, path=MOTION_CONFIG_PATH, interval=1.0):
+        super().__init__(name='config-watcher', daemon=True)
+        self.on_change = on_change
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self._stamp = self._stat()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            stamp = self._stat()
+            if stamp is None or stamp == self._stamp:
+                continue
+            self._stamp = stamp
+            try:
+                cfg = read_motion_config(self.path)
+            except (OSError, ValueError) as e:
+                logger.error("Ignoring invalid %s: %s", self.path, e)
+                continue
+            logger.info("Detected change in %s", self.path)
+            self.on_change(cfg)
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,76 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Components the server reports readiness for in /health
+COMPONENTS = ('config', 'opencv', 'camera', 'gpio', 'motion', 'http')
+
+
+class StartupReport:
+    """Per-component readiness plus wall-clock timing of each startup phase.
+
+    Phases run on different threads (camera and GPIO come up concurrently),
+    so everything is guarded by one lock and timestamps are relative to the
+    moment the report was created, i.e. module import.
+    """
+
+    def __init__(self):
+        self.t0 = time.monotonic()
+        self.lock = threading.Lock()
+        self.phases = []
+        self.components = {name: {'state': 'pending'} for name in COMPONENTS}
+
+    def _now(self):
+        return round(time.monotonic() - self.t0, 3)
+
+    def set_state(self, component, state, error=None):
+        with self.lock:
+            entry = {'state': state, 'at': self._now()}
+            if error is not None:
+                entry['error'] = str(error)
+            self.components[component] = entry
+
+    def is_ready(self, component):
+        with self.lock:
+            return self.components[component]['state'] == 'ready'
+
+    @contextmanager
+    def phase(self, name, component=None):
+        """Time a startup step and, if given, move `component` through
+        starting -> ready/failed around it. Exceptions propagate."""
+        if component:
+            self.set_state(component, 'starting')
+        start = self._now()
+        try:
+            yield
+        except Exception as e:
+            self._record(name, start, 'failed')
+            if component:
+                self.set_state(component, 'failed', e)
+            raise
+        self._record(name, start, 'ok')
+        if component:
+            self.set_state(component, 'ready')
+
+    def _record(self, name, start, status):
+        end = self._now()
+        with self.lock:
+            self.phases.append({
+                'name': name, 'start': start, 'end': end,
+                'duration': round(end - start, 3), 'status': status,
+                'thread': threading.current_thread().name
+            })
+
+    def snapshot(self):
+        with self.lock:
+            components = {k: dict(v) for k, v in self.components.items()}
+            phases = sorted((dict(p) for p in self.phases), key=lambda p: p['start'])
+        return {
+            'ready': all(c['state'] == 'ready' for c in components.values()),
+            'uptime': self._now(),
+            'components': components,
+            'phases': phases
+        }
+
+
+report = StartupReport()
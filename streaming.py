@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from tracing import tracer
+
+logger = logging.getLogger('streaming')
+
+BOUNDARY = b'frame'
+
+
+def mjpeg_part(jpg, timestamp=None):
+    """One multipart/x-mixed-replace part. Content-Length lets clients read
+    frames without scanning for the boundary; X-Timestamp is capture time."""
+    ts = time.time() if timestamp is None else timestamp
+    return (b'--' + BOUNDARY + b'\r\n'
+            b'Content-Type: image/jpeg\r\n'
+            b'Content-Length: ' + str(len(jpg)).encode() + b'\r\n'
+            b'X-Timestamp: ' + f"{ts:.3f}".encode() + b'\r\n\r\n' + jpg + b'\r\n')
+
+
+class MjpegServer:
+    """Serve the live feed to many viewers from one asyncio thread.
+
+    Each new frame is JPEG-encoded once, on a single encoder thread, and the
+    same bytes are handed to every viewer, so the thread count is fixed no
+    matter how many clients connect. A viewer only ever has the latest frame
+    queued (slow ones skip frames rather than buffer them), and one that
+    cannot take a frame within `write_timeout` seconds is disconnected.
+
+    get_frame() -> (seq, frame or None); authorize(token) -> bool;
+    get_fps() -> target frame rate.
+    """
+
+    def __init__(self, get_frame, authorize, get_fps, host='0.0.0.0', port=8088,
+                 max_clients=32, write_timeout=5.0, quality=80):
+        self.get_frame = get_frame
+        self.authorize = authorize
+        self.get_fps = get_fps
+        self.host = host
+        self.port = port
+        self.max_clients = max_clients
+        self.write_timeout = write_timeout
+        self.quality = quality
+        self.clients = set()
+        self.stats = {'served': 0, 'dropped': 0, 'rejected': 0, 'frames_encoded': 0}
+        self.encoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mjpeg-encode')
+        self.thread = threading.Thread(target=self._run, name='mjpeg-server', daemon=True)
+        self.ready = threading.Event()
+        self.loop = None
+        self.error = None
+
+    # --- lifecycle (called from other threads) ---
+    def start(self, timeout=5.0):
+        self.thread.start()
+        self.ready.wait(timeout)
+        if self.error:
+            raise self.error
+
+    def stop(self):
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self._stopping.set)
+        self.thread.join(5.0)
+        self.encoder.shutdown(wait=False)
+
+    def report(self):
+        return {'clients': len(self.clients), **self.stats}
+
+    # --- event loop ---
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.loop.run_until_complete(self._main())
+        except Exception as e:
+            self.error = e
+            self.ready.set()
+            logger.exception("MJPEG server failed")
+        finally:
+            self.loop.close()
+
+    async def _main(self):
+        self._stopping = asyncio.Event()
+        self._cond = asyncio.Condition()
+        self._part = None
+        self._part_seq = 0
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        encoder = asyncio.ensure_future(self._encode_loop())
+        logger.info("MJPEG stream listening on %s:%d", self.host, self.port)
+        self.ready.set()
+        async with server:
+            await self._stopping.wait()
+        encoder.cancel()
+        async with self._cond:
+            self._cond.notify_all()
+
+    def _encode(self, frame):
+        import cv2
+        with tracer.span('jpeg_encode'):
+            ok, jpg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return jpg.tobytes() if ok else None
+
+    async def _encode_loop(self):
+        last_seq = None
+        while True:
+            await asyncio.sleep(1.0 / self.get_fps())
+            if not self.clients:
+                continue
+            seq, frame = self.get_frame()
+            if frame is None or seq == last_seq:
+                continue
+            jpg = await self.loop.run_in_executor(self.encoder, self._encode, frame)
+            if jpg is None:
+                continue
+            last_seq = seq
+            self.stats['frames_encoded'] += 1
+            async with self._cond:
+                self._part = mjpeg_part(jpg)
+                self._part_seq += 1
+                self._cond.notify_all()
+
+    async def _respond(self, writer, status, body=b''):
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        try:
+            await asyncio.wait_for(writer.drain(), self.write_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+
+    async def _read_request(self, reader):
+        line = await asyncio.wait_for(reader.readline(), self.write_timeout)
+        for _ in range(100):  # skip headers, bounded
+            header = await asyncio.wait_for(reader.readline(), self.write_timeout)
+            if header in (b'\r\n', b'\n', b''):
+                break
+        parts = line.decode('latin-1').split()
+        return parts[1] if len(parts) >= 2 else ''
+
+    async def _handle(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        try:
+            target = await self._read_request(reader)
+            url = urlsplit(target)
+            if url.path != '/stream':
+                await self._respond(writer, '404 Not Found', b'Not found')
+                return
+            if not self.authorize(parse_qs(url.query).get('token', [''])[0]):
+                self.stats['rejected'] += 1
+                await self._respond(writer, '403 Forbidden', b'Invalid or expired token')
+                return
+            if len(self.clients) >= self.max_clients:
+                self.stats['rejected'] += 1
+                await self._respond(writer, '503 Service Unavailable', b'Too many viewers')
+                return
+            await self._stream(writer, peer)
+        except (asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _stream(self, writer, peer):
+        self.clients.add(writer)
+        self.stats['served'] += 1
+        logger.info("Viewer %s connected (%d total)", peer, len(self.clients))
+        # Keep at most about one frame queued in the kernel/transport
+        writer.transport.set_write_buffer_limits(high=64 * 1024)
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: multipart/x-mixed-replace; boundary=" + BOUNDARY + b"\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        last_seq = 0
+        try:
+            while not self._stopping.is_set():
+                async with self._cond:
+                    await self._cond.wait_for(
+                        lambda: self._part_seq != last_seq or self._stopping.is_set())
+                    last_seq, part = self._part_seq, self._part
+                if part is None:
+                    continue
+                writer.write(part)
+                await asyncio.wait_for(writer.drain(), self.write_timeout)
+        except asyncio.TimeoutError:
+            self.stats['dropped'] += 1
+            logger.info("Dropping stalled viewer %s", peer)
+        finally:
+            self.clients.discard(writer)
+            logger.info("Viewer %s disconnected (%d total)", peer, len(self.clients))
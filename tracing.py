@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'args', 'start')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        self.tracer._record(self.name, self.start, end - self.start, self.args)
+        return False
+
+
+class _TracedLock:
+    """Acquire `lock`, recording the time spent waiting for it as a span."""
+    __slots__ = ('tracer', 'lock', 'name')
+
+    def __init__(self, tracer, lock, name):
+        self.tracer = tracer
+        self.lock = lock
+        self.name = name
+
+    def __enter__(self):
+        start = time.perf_counter_ns()
+        self.lock.acquire()
+        self.tracer._record(self.name, start, time.perf_counter_ns() - start, None)
+        return self
+
+    def __exit__(self, *exc):
+        self.lock.release()
+        return False
+
+
+class Tracer:
+    """Span recorder for the capture/stream/web hot paths.
+
+    While disabled, span() returns a shared no-op context manager and
+    locked() returns the lock itself, so instrumentation costs one attribute
+    check per call. While enabled, finished spans go into a bounded deque
+    holding the last `window` seconds, exportable as Chrome trace JSON
+    (chrome://tracing, ui.perfetto.dev).
+    """
+
+    def __init__(self, window=10.0, max_events=200000):
+        self.enabled = False
+        self.window = window
+        self.events = deque(maxlen=max_events)
+        self.thread_names = {}
+
+    def configure(self, enabled=None, window=None):
+        if window is not None:
+            self.window = float(window)
+        if enabled is not None:
+            if enabled and not self.enabled:
+                self.events.clear()
+            self.enabled = bool(enabled)
+
+    def span(self, name, args=None):
+        if not self.enabled:
+            return _NOOP
+        return _Span(self, name, args)
+
+    def locked(self, lock, name):
+        if not self.enabled:
+            return lock
+        return _TracedLock(self, lock, name)
+
+    def _record(self, name, start, dur, args):
+        tid = threading.get_ident()
+        if tid not in self.thread_names:
+            self.thread_names[tid] = threading.current_thread().name
+        self.events.append((name, start, dur, tid, args))
+        cutoff = start - int(self.window * 1e9)
+        try:
+            while self.events[0][1] < cutoff:
+                self.events.popleft()
+        except IndexError:
+            pass
+
+    def status(self):
+        return {'enabled': self.enabled, 'window': self.window, 'events': len(self.events)}
+
+    def export(self):
+        """Chrome trace-event JSON (as a dict) for the buffered window."""
+        events = list(self.events)
+        cutoff = time.perf_counter_ns() - int(self.window * 1e9)
+        pid = os.getpid()
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                 for tid, name in list(self.thread_names.items())]
+        for name, start, dur, tid, args in events:
+            if start < cutoff:
+                continue
+            ev = {'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                  'ts': start / 1000.0, 'dur': dur / 1000.0}
+            if args:
+                ev['args'] = args
+            trace.append(ev)
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+
+tracer = Tracer()
@@ -9,26 +9,24 @@ import logging
 import yaml
 from picamera2 import Picamera2
 from buzzer import setup_gpio, activate_siren, deactivate_siren
-import RPi.GPIO as GPIO
+import actuators
+from actuators import NIGHT_LIGHT_PIN
 import threading
 
-# Night light pin
-NIGHT_LIGHT_PIN = 7
 shutdown_flag = threading.Event()
 
 # --- GPIO & Light Setup ---
 def setup_night_light():
-    GPIO.setmode(GPIO.BCM)
-    GPIO.setup(NIGHT_LIGHT_PIN, GPIO.OUT)
+    actuators.get_service()
     logging.getLogger('motion_detection').info("Night light initialized on PIN %d", NIGHT_LIGHT_PIN)
 
 def activate_night_light():
-    GPIO.output(NIGHT_LIGHT_PIN, GPIO.HIGH)
+    actuators.get_service().set('night_light', {NIGHT_LIGHT_PIN: 1})
     logging.getLogger('motion_detection').info("Night light activated")
 
 
 def deactivate_night_light():
-    GPIO.output(NIGHT_LIGHT_PIN, GPIO.LOW)
+    actuators.get_service().stop('night_light')
     logging.getLogger('motion_detection').info("Night light deactivated")
 
 # --- Configuration ---
@@ -141,7 +139,7 @@ def motion_loop():
 
     # Cleanup
     if cfg['alarm']['enabled']: deactivate_siren()
-    deactivate_night_light(); camera.stop(); GPIO.cleanup(); logger.info("Motion loop stopped")
+    deactivate_night_light(); camera.stop(); actuators.shutdown(); logger.info("Motion loop stopped")
 
 if __name__ == '__main__':
     try: